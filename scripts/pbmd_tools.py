@@ -59,6 +59,31 @@ def record_api_error(query="",
         error_file.write(f"{json.dumps(dict(response.json()), indent=4)}\n\n")
 
 
+def is_transient_api_error(response):
+    """Check if an API error is temporary and the query should be retried.
+
+    Rate limits (429, or 403 with rate limit headers or message from GitHub)
+    and server errors (5xx) are temporary. Other errors (404...) are final.
+
+    Parameters
+    ----------
+    response: requests.Response
+        Response from the API.
+
+    Returns
+    -------
+    bool
+        True if the query should be retried.
+    """
+    if response.status_code == 429 or response.status_code >= 500:
+        return True
+    if response.status_code == 403:
+        return (response.headers.get("X-RateLimit-Remaining") == "0"
+                or "Retry-After" in response.headers
+                or "rate limit" in response.text.lower())
+    return False
+
+
 ##############################################################################
 ####################################----PUBMED----############################
 ##############################################################################
@@ -320,7 +345,8 @@ def extract_pubdate_from_summary(summary):
     Returns
     -------
     str
-        Publication date.
+        Publication date in YYYY-XX-DD format (example: 2023-Jan-01 or 2022-5-17).
+        Dates are normalized for all articles at once with normalize_dates().
     """
     try:
         article = summary["PubmedArticleSet"]["PubmedArticle"]
@@ -329,7 +355,7 @@ def extract_pubdate_from_summary(summary):
     except KeyError:
         pass
     else:
-        return normalize_date(pubdate)
+        return pubdate
     try:
         article = summary["PubmedArticleSet"]["PubmedArticle"]
         date = article["MedlineCitation"]["Article"]["Journal"]["JournalIssue"]["PubDate"]
@@ -337,7 +363,7 @@ def extract_pubdate_from_summary(summary):
     except KeyError:
         pass
     else:
-        return normalize_date(pubdate)
+        return pubdate
     # No ArticleDate neither PubDate
     # Example:
     # https://pubmed.ncbi.nlm.nih.gov/25344330/
@@ -349,32 +375,82 @@ def extract_pubdate_from_summary(summary):
     except KeyError:
         pass
     else:
-        return normalize_date(pubdate)
+        return pubdate
     return ""
 
 
-def normalize_date(date):
-    """Normalize date to ISO-8601 standard format.
+MONTHS = {'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04', 'May': '05', 'Jun': '06', 
+          'Jul': '07', 'Aug': '08', 'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12',
+          '1': '01', '2': '02', '3': '03', '4': '04', '5': '05', '6': '06', 
+          '7': '07', '8': '08', '9': '09', '10': '10', '11': '11', '12': '12'}
+
+
+def normalize_dates(dates):
+    """Normalize a column of dates and convert them to datetime64.
+
+    Months given as names or as numbers are normalized with MONTHS.
+    Missing or invalid dates are converted to NaT.
 
     Parameters
     ----------
-    date_str : str
-        Date in YYYY-XX-DD format (example: 2023-Jan-01 or 2022-5-17)
+    dates : pandas.Series
+        Dates in YYYY-XX-DD format (example: 2023-Jan-01 or 2022-5-17).
 
     Returns
     -------
-    converted_date : str
-        Date in a standard YYYY-MM-DD format (example: 2023-01-01 or 2022-05-17).
- 
+    pandas.Series
+        Dates as datetime64 (example: 2023-01-01 or 2022-05-17).
     """
-    months = {'Jan': '01', 'Feb': '02', 'Mar': '03', 'Apr': '04', 'May': '05', 'Jun': '06', 
-              'Jul': '07', 'Aug': '08', 'Sep': '09', 'Oct': '10', 'Nov': '11', 'Dec': '12',
-              '1': '01', '2': '02', '3': '03', '4': '04', '5': '05', '6': '06', 
-              '7': '07', '8': '08', '9': '09', '10': '10', '11': '11', '12': '12'}
-    year, month, day = date.split('-')
-    month = months.get(month, month)
-    date_new = f"{year}-{month}-{day}"
-    return date_new
+    fields = pd.Series(dates, dtype="object").str.extract(r"^(\d{4})-([^-]+)-(\d{1,2})$")
+    month = fields[1].map(MONTHS).where(fields[1].isin(MONTHS.keys()), fields[1])
+    return pd.to_datetime(
+        fields[0] + "-" + month + "-" + fields[2].str.zfill(2),
+        format="%Y-%m-%d",
+        errors="coerce"
+    )
+
+
+ARTICLE_COLUMNS = ["publication_date", "DOI", "journal", "title", "abstract",
+                   "GitHub_link_raw", "GitHub_link_clean", "GitHub_repo_owner", "GitHub_repo_name"]
+
+
+def articles_to_dataframe(articles, columns=ARTICLE_COLUMNS):
+    """Store parsed articles as a compact dataframe.
+
+    Articles are read one by one (for instance from a generator) and
+    their fields are appended to columns, so the dictionaries returned by
+    parse_pubmed_xml() do not stay in memory. Journal names are stored once
+    as categories and publication dates are converted to datetime64
+    for all articles at once. Articles with a PMID already seen are skipped.
+
+    Parameters
+    ----------
+    articles : iterable
+        Dictionaries returned by parse_pubmed_xml().
+    columns : list
+        Columns to keep. Must contain "publication_date" and "journal".
+
+    Returns
+    -------
+    pandas.DataFrame
+        Articles indexed by PMID.
+    """
+    pmids = {}
+    values = {column: [] for column in columns}
+    journals = {}
+    for article in articles:
+        if article["PMID"] in pmids:
+            continue
+        pmids[article["PMID"]] = None
+        for column in columns:
+            value = article[column]
+            if column == "journal":
+                value = journals.setdefault(value, len(journals))
+            values[column].append(value)
+    values["journal"] = pd.Categorical.from_codes(values["journal"], categories=list(journals))
+    df = pd.DataFrame(values, index=pd.Index(list(pmids), name="PMID"), columns=columns)
+    df["publication_date"] = normalize_dates(df["publication_date"])
+    return df
 
 
 def extract_title_from_summary(summary):
@@ -615,11 +691,14 @@ def extract_github_repo_owner_name_from_link(url):
     return repo_owner, repo_name
 
 
-def get_repo_info(pmid=0, url="", token="", log_name=""):
+def get_repo_info(pmid=0, url="", token="", log_name="", api_url="https://api.github.com"):
     """
     Get GitHub repository info.
     
     Example: https://api.github.com/repos/LMSE/FYRMENT
+
+    Temporary errors (rate limits, server errors) raise requests.HTTPError
+    so that the query can be retried later.
     
     Parameters
     ----------
@@ -631,6 +710,8 @@ def get_repo_info(pmid=0, url="", token="", log_name=""):
         Access token for github.
     log_name : str
         File name for logs.
+    api_url : str
+        Base URL of the GitHub API.
 
     Returns
     -------
@@ -640,7 +721,7 @@ def get_repo_info(pmid=0, url="", token="", log_name=""):
     
     headers = {"Authorization": f"Token {token}"}
     owner, repo = extract_github_repo_owner_name_from_link(url)
-    query = f"https://api.github.com/repos/{owner}/{repo}"
+    query = f"{api_url}/repos/{owner}/{repo}"
     wait_time = 0.75  # max 5000 requests / hour = 1 request / 0.72 second
     info = {"date_repo_created": None, "date_repo_updated": None, "is_fork": None}
     response = requests.get(query, headers=headers)
@@ -652,6 +733,10 @@ def get_repo_info(pmid=0, url="", token="", log_name=""):
                          append_log=True
                         )
         print(f"ERROR with query: {query}")
+        if is_transient_api_error(response):
+            # Wait to avoid rate limit
+            time.sleep(wait_time)
+            response.raise_for_status()
     else:
         repository_info = response.json()
         info["is_fork"] = repository_info["fork"]
@@ -666,7 +751,7 @@ def get_repo_info(pmid=0, url="", token="", log_name=""):
 ####################################----SOFTWH----##########################################
 ############################################################################################
 
-def check_repository_is_archived_in_swh(url):
+def check_repository_is_archived_in_swh(url, token="", api_url="https://archive.softwareheritage.org/api/1"):
     """
     Get Software Heritage repository info.
     
@@ -678,19 +763,31 @@ def check_repository_is_archived_in_swh(url):
     - url: https://github.com/pierrepo/blabla/
     - API: https://archive.softwareheritage.org/api/1/origin/https://github.com/pierrepo/blabla/visit/latest/
 
+    Temporary errors (rate limits, server errors) raise requests.HTTPError
+    so that the query can be retried later.
+
     Parameters
     ----------
     url : str
         URL of the GitHub repository.
+    token : str
+        Access token for Software Heritage (optional, raises the rate limit).
+    api_url : str
+        Base URL of the Software Heritage API.
 
     Returns
     -------
     dict
         Dictionnary with archive status and date of last archive.
     """
+    headers = {}
+    if token:
+        headers = {"Authorization": f"Bearer {token}"}
     info = {"is_archived": False, "date_archived": None}
-    query = f"https://archive.softwareheritage.org/api/1/origin/{url}visit/latest/"
-    response = requests.get(query)
+    query = f"{api_url}/origin/{url}visit/latest/"
+    response = requests.get(query, headers=headers)
+    if is_transient_api_error(response):
+        response.raise_for_status()
     if response.status_code == 200:
         info["is_archived"] = True
         info["date_archived"] = response.json()["date"].split("T")[0]
@@ -0,0 +1,156 @@
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+
+
+############################################################################################
+###################################----STUB----#############################################
+############################################################################################
+
+class StubAPIHandler(BaseHTTPRequestHandler):
+    """Answer GitHub and Software Heritage API queries with fake data.
+
+    Supported queries:
+    - /repos/{owner}/{repo} (GitHub repository info)
+    - /origin/{url}visit/latest/ (Software Heritage last visit)
+    """
+
+    def do_GET(self):
+        self.server.queries.append(self.path)
+        if self.path.startswith("/repos/"):
+            owner, repo = self.path[len("/repos/"):].strip("/").split("/")[:2]
+            repository = self.server.repositories.get(f"{owner}/{repo}")
+            if self.send_error_status(f"{owner}/{repo}"):
+                return
+            if repository is None:
+                self.send_json(404, {"message": "Not Found"})
+            else:
+                self.send_json(200, {
+                    "fork": repository.get("fork", False),
+                    "created_at": repository.get("created_at", "2020-01-01T00:00:00Z"),
+                    "updated_at": repository.get("updated_at", "2021-01-01T00:00:00Z"),
+                })
+        elif self.path.startswith("/origin/") and self.path.endswith("visit/latest/"):
+            origin = self.path[len("/origin/"):-len("visit/latest/")]
+            date_archived = self.server.archives.get(origin)
+            if self.send_error_status(origin):
+                return
+            if date_archived is None:
+                self.send_json(404, {"exception": "NotFoundExc"})
+            else:
+                self.send_json(200, {"date": f"{date_archived}T00:00:00+00:00"})
+        else:
+            self.send_json(404, {"message": "Not Found"})
+
+    def send_error_status(self, key):
+        """Send the next error status planned for a repository, if any.
+
+        Parameters
+        ----------
+        key : str
+            Repository ("owner/repo" for GitHub, URL for Software Heritage).
+
+        Returns
+        -------
+        bool
+            True if an error has been sent.
+        """
+        with self.server.lock:
+            errors = self.server.errors.get(key, [])
+            if not errors:
+                return False
+            status_code = errors.pop(0)
+        self.send_json(status_code, {"message": f"Stub error {status_code}"})
+        return True
+
+    def send_json(self, status_code, content):
+        """Send a JSON answer.
+
+        Parameters
+        ----------
+        status_code : int
+            HTTP status code.
+        content : dict
+            Answer content.
+        """
+        body = json.dumps(content).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep the output of workers readable.
+        pass
+
+
+def start_stub_api(repositories=None, archives=None, errors=None, port=0):
+    """Start a stub API server in a background thread.
+
+    Parameters
+    ----------
+    repositories : dict
+        GitHub repositories info indexed by "owner/repo".
+        Example: {"pierrepo/seq-to-first-iso": {"fork": False, "created_at": "2018-05-21T09:04:51Z"}}
+    archives : dict
+        Dates of last archive indexed by repository URL.
+        Example: {"https://github.com/pierrepo/seq-to-first-iso/": "2023-01-01"}
+    errors : dict
+        HTTP error status codes returned by the next queries of a repository,
+        indexed by "owner/repo" (GitHub) or by repository URL (Software Heritage).
+        Example: {"pierrepo/seq-to-first-iso": [429, 500]}
+    port : int
+        Port of the server. A free port is chosen if 0.
+
+    Returns
+    -------
+    ThreadingHTTPServer
+        The running server. Its base URL is http://localhost:{server.server_port}
+        and the list of received queries is stored in server.queries.
+    """
+    server = ThreadingHTTPServer(("localhost", port), StubAPIHandler)
+    server.repositories = repositories or {}
+    server.archives = archives or {}
+    server.errors = errors or {}
+    server.lock = threading.Lock()
+    server.queries = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+############################################################################################
+###################################----MAIN----#############################################
+############################################################################################
+
+def main():
+    """Run the stub API server from the command line.
+
+    Example: python -m scripts.stub_api --port 8000 --data stub_data.json
+    """
+    parser = argparse.ArgumentParser(description="Run a stub GitHub and Software Heritage API server.")
+    parser.add_argument("--port", type=int, default=8000, help="port of the server")
+    parser.add_argument("--data", default=None,
+                        help='JSON file with "repositories", "archives" and "errors" dictionaries')
+    args = parser.parse_args()
+
+    data = {}
+    if args.data:
+        with open(args.data, "r") as data_file:
+            data = json.load(data_file)
+    server = start_stub_api(
+        repositories=data.get("repositories"),
+        archives=data.get("archives"),
+        errors=data.get("errors"),
+        port=args.port
+    )
+    print(f"Stub API server running at http://localhost:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
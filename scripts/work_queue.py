@@ -0,0 +1,478 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import pathlib
+import socket
+import sqlite3
+import sys
+import time
+
+import dotenv
+
+from scripts import pbmd_tools as tools
+
+
+############################################################################################
+##################################----QUEUE----#############################################
+############################################################################################
+
+def connect_queue(db_name):
+    """Open a connection to the SQLite work queue.
+
+    Transactions are handled explicitly (autocommit mode) so that
+    claims can take the write lock with BEGIN IMMEDIATE.
+
+    Parameters
+    ----------
+    db_name : str
+        SQLite file storing the queue.
+
+    Returns
+    -------
+    sqlite3.Connection
+        Connection to the queue.
+    """
+    connection = sqlite3.connect(db_name, timeout=60, isolation_level=None)
+    connection.execute("PRAGMA busy_timeout = 60000")
+    return connection
+
+
+def create_queue(db_name, tasks, source=""):
+    """Create the work queue and add tasks to it.
+
+    The queue is resumed only if it was created from the same source
+    (for instance an input file and its modification time).
+    Otherwise, the queue is emptied and all tasks are queried again.
+    When a queue is resumed, tasks with a new URL are queried again,
+    unfinished tasks get new attempts and tasks not listed anymore are removed.
+
+    Parameters
+    ----------
+    db_name : str
+        SQLite file storing the queue.
+    tasks : list
+        List of (pmid, url) tuples.
+    source : str
+        Identifier of the data the tasks come from.
+    """
+    now = time.time()
+    tasks = [(int(pmid), str(url)) for pmid, url in tasks]
+    connection = connect_queue(db_name)
+    try:
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            "pmid INTEGER PRIMARY KEY, "
+            "url TEXT NOT NULL, "
+            "status TEXT NOT NULL DEFAULT 'pending', "
+            "worker TEXT, "
+            "lease_expires REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "result TEXT)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        connection.execute("BEGIN IMMEDIATE")
+        queue_source = connection.execute(
+            "SELECT value FROM metadata WHERE key = 'source'"
+        ).fetchone()
+        if queue_source is None or queue_source[0] != source:
+            connection.execute("DELETE FROM tasks")
+            connection.execute(
+                "INSERT OR REPLACE INTO metadata (key, value) VALUES ('source', ?)",
+                (source,)
+            )
+        # Query again tasks whose URL changed.
+        connection.executemany(
+            "INSERT INTO tasks (pmid, url) VALUES (?, ?) "
+            "ON CONFLICT (pmid) DO UPDATE SET url = excluded.url, status = 'pending', "
+            "worker = NULL, lease_expires = NULL, attempts = 0, result = NULL "
+            "WHERE url != excluded.url",
+            tasks
+        )
+        # Give new attempts to unfinished tasks not leased anymore.
+        connection.execute(
+            "UPDATE tasks SET status = 'pending', lease_expires = NULL, attempts = 0 "
+            "WHERE status != 'done' AND (lease_expires IS NULL OR lease_expires < ?)",
+            (now,)
+        )
+        connection.execute(
+            "DELETE FROM tasks WHERE pmid NOT IN (SELECT value FROM json_each(?))",
+            (json.dumps([pmid for pmid, _ in tasks]),)
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+
+
+def claim_batch(db_name, worker="", batch_size=50, lease_time=600, max_attempts=3):
+    """Claim a batch of tasks for a worker.
+
+    Pending tasks and tasks whose lease has expired (crashed or stalled
+    worker) can be claimed. Tasks already tried max_attempts times are skipped.
+
+    Parameters
+    ----------
+    db_name : str
+        SQLite file storing the queue.
+    worker : str
+        Worker name.
+    batch_size : int
+        Maximum number of tasks to claim.
+    lease_time : float
+        Lease duration in seconds.
+    max_attempts : int
+        Maximum number of attempts per task.
+
+    Returns
+    -------
+    list
+        List of (pmid, url) tuples leased to the worker.
+    """
+    now = time.time()
+    connection = connect_queue(db_name)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        tasks = connection.execute(
+            "SELECT pmid, url FROM tasks "
+            "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) "
+            "AND attempts < ? "
+            "ORDER BY attempts, pmid LIMIT ?",
+            (now, max_attempts, batch_size)
+        ).fetchall()
+        connection.executemany(
+            "UPDATE tasks SET status = 'leased', worker = ?, lease_expires = ?, "
+            "attempts = attempts + 1 WHERE pmid = ?",
+            [(worker, now + lease_time, pmid) for pmid, _ in tasks]
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        if connection.in_transaction:
+            connection.execute("ROLLBACK")
+        raise
+    finally:
+        connection.close()
+    return tasks
+
+
+def complete_task(db_name, pmid, worker="", result=None):
+    """Store the result of a task.
+
+    The result is written only if the task is still assigned to this worker.
+    A worker whose lease expired and whose task was taken over by
+    another worker cannot overwrite the result, and writing the same
+    result twice has no effect.
+
+    Parameters
+    ----------
+    db_name : str
+        SQLite file storing the queue.
+    pmid : int
+        PubMed PMID of the task.
+    worker : str
+        Worker name.
+    result : dict
+        Result of the task.
+
+    Returns
+    -------
+    bool
+        True if the result has been stored.
+    """
+    connection = connect_queue(db_name)
+    try:
+        cursor = connection.execute(
+            "UPDATE tasks SET status = 'done', lease_expires = NULL, result = ? "
+            "WHERE pmid = ? AND worker = ?",
+            (json.dumps(result), int(pmid), worker)
+        )
+        is_stored = cursor.rowcount == 1
+    finally:
+        connection.close()
+    return is_stored
+
+
+def release_task(db_name, pmid, worker=""):
+    """Give a task back to the queue after a failure.
+
+    Parameters
+    ----------
+    db_name : str
+        SQLite file storing the queue.
+    pmid : int
+        PubMed PMID of the task.
+    worker : str
+        Worker name.
+    """
+    connection = connect_queue(db_name)
+    try:
+        connection.execute(
+            "UPDATE tasks SET status = 'pending', lease_expires = NULL "
+            "WHERE pmid = ? AND status = 'leased' AND worker = ?",
+            (int(pmid), worker)
+        )
+    finally:
+        connection.close()
+
+
+def next_lease_expiration(db_name, max_attempts=3):
+    """Get the earliest lease expiration among unfinished tasks.
+
+    Parameters
+    ----------
+    db_name : str
+        SQLite file storing the queue.
+    max_attempts : int
+        Maximum number of attempts per task.
+
+    Returns
+    -------
+    float or None
+        Timestamp of the next lease expiration,
+        None if no task can be claimed anymore.
+    """
+    connection = connect_queue(db_name)
+    try:
+        expiration = connection.execute(
+            "SELECT MIN(lease_expires) FROM tasks "
+            "WHERE status = 'leased' AND attempts < ?",
+            (max_attempts,)
+        ).fetchone()[0]
+    finally:
+        connection.close()
+    return expiration
+
+
+def read_results(db_name):
+    """Read results of completed tasks.
+
+    Parameters
+    ----------
+    db_name : str
+        SQLite file storing the queue.
+
+    Returns
+    -------
+    dict
+        Results indexed by PMID.
+    """
+    connection = connect_queue(db_name)
+    try:
+        rows = connection.execute(
+            "SELECT pmid, result FROM tasks WHERE status = 'done'"
+        ).fetchall()
+    finally:
+        connection.close()
+    return {pmid: json.loads(result) for pmid, result in rows}
+
+
+def run_worker(db_name, task_function, worker="", batch_size=50,
+               lease_time=600, max_attempts=3, poll_interval=10):
+    """Process tasks from the queue until no task is left.
+
+    Several workers can run at the same time, on the same machine or
+    on different machines sharing the SQLite file. SQLite locks are not
+    reliable on network filesystems (NFS, SMB): the SQLite file must be
+    stored on a local filesystem or on a filesystem with working POSIX locks,
+    otherwise several workers may claim the same tasks.
+    When all remaining tasks are leased by other workers, the worker
+    checks the queue again every poll_interval seconds, to take over
+    tasks of stalled workers once their lease expires.
+
+    Parameters
+    ----------
+    db_name : str
+        SQLite file storing the queue.
+    task_function : function
+        Function called with (pmid, url) and returning a dict.
+    worker : str
+        Worker name.
+    batch_size : int
+        Number of tasks claimed at once.
+    lease_time : float
+        Lease duration in seconds.
+        Should be longer than the time needed to process a batch.
+    max_attempts : int
+        Maximum number of attempts per task.
+    poll_interval : float
+        Time in seconds between two checks of the queue
+        while remaining tasks are leased by other workers.
+
+    Returns
+    -------
+    int
+        Number of tasks completed by the worker.
+    """
+    completed = 0
+    while True:
+        tasks = claim_batch(db_name, worker=worker, batch_size=batch_size,
+                            lease_time=lease_time, max_attempts=max_attempts)
+        if not tasks:
+            expiration = next_lease_expiration(db_name, max_attempts=max_attempts)
+            if expiration is None:
+                break
+            time.sleep(min(max(expiration - time.time(), 0), poll_interval))
+            continue
+        for pmid, url in tasks:
+            try:
+                result = task_function(pmid, url)
+            except Exception as error:
+                print(f"ERROR with task {pmid} ({url}): {error}")
+                release_task(db_name, pmid, worker=worker)
+                continue
+            if complete_task(db_name, pmid, worker=worker, result=result):
+                completed += 1
+    return completed
+
+
+def run_workers(db_name, tokens, make_task, batch_size=50,
+                lease_time=600, max_attempts=3, poll_interval=10):
+    """Process tasks from the queue with one worker thread per token.
+
+    Parameters
+    ----------
+    db_name : str
+        SQLite file storing the queue.
+    tokens : list
+        List of API tokens.
+    make_task : function
+        Function called with a token and returning the task function
+        given to run_worker().
+    batch_size : int
+        Number of tasks claimed at once.
+    lease_time : float
+        Lease duration in seconds.
+    max_attempts : int
+        Maximum number of attempts per task.
+    poll_interval : float
+        Time in seconds between two checks of the queue
+        while remaining tasks are leased by other workers.
+
+    Returns
+    -------
+    int
+        Number of tasks completed by all workers.
+    """
+    with ThreadPoolExecutor(max_workers=len(tokens)) as executor:
+        futures = [
+            executor.submit(
+                run_worker,
+                db_name,
+                make_task(token),
+                worker=f"{socket.gethostname()}-{os.getpid()}-{index}",
+                batch_size=batch_size,
+                lease_time=lease_time,
+                max_attempts=max_attempts,
+                poll_interval=poll_interval
+            )
+            for index, token in enumerate(tokens)
+        ]
+        # Raise errors from workers, if any.
+        return sum(future.result() for future in futures)
+
+
+def report_unfinished_tasks(tasks, results, log_name):
+    """Report tasks without result after all attempts.
+
+    Parameters
+    ----------
+    tasks : list
+        List of (pmid, url) tuples put in the queue.
+    results : dict
+        Results indexed by PMID, as returned by read_results().
+    log_name : str
+        File name for logs.
+
+    Returns
+    -------
+    list
+        List of (pmid, url) tuples without result.
+    """
+    unfinished = [(pmid, url) for pmid, url in tasks if pmid not in results]
+    if unfinished:
+        pathlib.Path(log_name).parent.mkdir(parents=True, exist_ok=True)
+        with open(log_name, "a") as log_file:
+            log_file.write(f"{len(unfinished)} tasks without result after all attempts:\n")
+            for pmid, url in unfinished:
+                log_file.write(f"{pmid}: {url}\n")
+        print(f"WARNING: {len(unfinished)} tasks without result, see {log_name}")
+    return unfinished
+
+
+def get_token_pool(name):
+    """Get a pool of API tokens from an environment variable.
+
+    Several tokens can be provided, separated by commas.
+
+    Parameters
+    ----------
+    name : str
+        Name of the environment variable.
+
+    Returns
+    -------
+    list
+        List of tokens. Contains an empty token if none is defined.
+    """
+    tokens = [token.strip() for token in os.environ.get(name, "").split(",")]
+    tokens = [token for token in tokens if token]
+    return tokens or [""]
+
+
+############################################################################################
+###################################----MAIN----#############################################
+############################################################################################
+
+def main():
+    """Run a worker from the command line.
+
+    Example: python -m scripts.work_queue github results/tmp/queue_github.sqlite
+    """
+    parser = argparse.ArgumentParser(description="Process API enrichment tasks from a work queue.")
+    parser.add_argument("api", choices=["github", "software_heritage"], help="API to query")
+    parser.add_argument("queue", help="SQLite file storing the queue")
+    parser.add_argument("--env", default=".env",
+                        help=".env file with API tokens (GITHUB_TOKEN or SWH_TOKEN)")
+    parser.add_argument("--token-index", type=int, default=0,
+                        help="index of the token to use in the token pool")
+    parser.add_argument("--api-url", default=None, help="base URL of the API")
+    parser.add_argument("--batch-size", type=int, default=50, help="number of tasks claimed at once")
+    parser.add_argument("--lease-time", type=float, default=600, help="lease duration in seconds")
+    parser.add_argument("--max-attempts", type=int, default=3, help="maximum number of attempts per task")
+    parser.add_argument("--log", default="logs/work_queue.txt", help="file name for logs")
+    args = parser.parse_args()
+
+    # Only the token of the queried API is needed.
+    # The Software Heritage API can be queried without token.
+    dotenv.load_dotenv(args.env)
+    if args.api == "github" and "GITHUB_TOKEN" not in os.environ:
+        sys.exit("Cannot find Github token")
+    pathlib.Path(args.log).parent.mkdir(parents=True, exist_ok=True)
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    if args.api == "github":
+        tokens = get_token_pool("GITHUB_TOKEN")
+        token = tokens[args.token_index % len(tokens)]
+        api_url = args.api_url or "https://api.github.com"
+        task_function = lambda pmid, url: tools.get_repo_info(
+            pmid=pmid, url=url, token=token, log_name=args.log, api_url=api_url
+        )
+    else:
+        tokens = get_token_pool("SWH_TOKEN")
+        token = tokens[args.token_index % len(tokens)]
+        api_url = args.api_url or "https://archive.softwareheritage.org/api/1"
+        task_function = lambda pmid, url: tools.check_repository_is_archived_in_swh(
+            url, token=token, api_url=api_url
+        )
+    completed = run_worker(args.queue, task_function, worker=worker,
+                           batch_size=args.batch_size, lease_time=args.lease_time,
+                           max_attempts=args.max_attempts)
+    print(f"Worker {worker} completed {completed} tasks")
+
+
+if __name__ == "__main__":
+    main()
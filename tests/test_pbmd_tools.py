@@ -0,0 +1,44 @@
+import pandas as pd
+
+from scripts import pbmd_tools as tools
+
+
+def make_article(pmid, publication_date="2023-Jan-01", journal="Bioinformatics"):
+    article = {column: "" for column in tools.ARTICLE_COLUMNS}
+    article.update({"PMID": pmid, "publication_date": publication_date, "journal": journal})
+    return article
+
+
+def test_normalize_dates():
+    dates = pd.Series(["2023-Jan-01", "2022-5-17", "2021-11-3", "2020-02-29", "", "2019-Foo-01"],
+                      index=[10, 11, 12, 13, 14, 15])
+    normalized = tools.normalize_dates(dates)
+    assert normalized.dtype.kind == "M"
+    assert list(normalized.index) == [10, 11, 12, 13, 14, 15]
+    assert list(normalized.dt.strftime("%Y-%m-%d")[:4]) == ["2023-01-01", "2022-05-17", "2021-11-03", "2020-02-29"]
+    assert normalized[14:].isna().all()
+
+
+def test_articles_to_dataframe():
+    articles = (make_article(pmid, journal=journal)
+                for pmid, journal in [(1, "Bioinformatics"), (2, "Nature"), (3, "Bioinformatics")])
+    df = tools.articles_to_dataframe(articles)
+    assert list(df.columns) == tools.ARTICLE_COLUMNS
+    assert df.index.name == "PMID"
+    assert list(df.index) == [1, 2, 3]
+    assert isinstance(df["journal"].dtype, pd.CategoricalDtype)
+    assert list(df["journal"]) == ["Bioinformatics", "Nature", "Bioinformatics"]
+    assert df["publication_date"].dtype.kind == "M"
+
+
+def test_articles_to_dataframe_duplicates():
+    df = tools.articles_to_dataframe([make_article(1), make_article(2), make_article(1)])
+    assert list(df.index) == [1, 2]
+
+
+def test_articles_to_dataframe_empty(tmp_path):
+    df = tools.articles_to_dataframe([])
+    assert df.empty
+    df.to_csv(tmp_path / "articles.tsv", sep="\t", index=True)
+    header = (tmp_path / "articles.tsv").read_text().strip().split("\t")
+    assert header == ["PMID"] + tools.ARTICLE_COLUMNS
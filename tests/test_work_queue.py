@@ -0,0 +1,180 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+import requests
+
+from scripts import pbmd_tools as tools
+from scripts import work_queue
+from scripts.stub_api import start_stub_api
+
+
+@pytest.fixture
+def queue(tmp_path):
+    db_name = str(tmp_path / "queue.sqlite")
+    work_queue.create_queue(db_name, [(1, "https://github.com/a/one/"),
+                                      (2, "https://github.com/a/two/"),
+                                      (3, "https://github.com/a/three/")])
+    return db_name
+
+
+@pytest.fixture
+def stub_api():
+    server = start_stub_api(
+        repositories={"a/one": {"fork": True, "created_at": "2019-03-04T10:00:00Z"},
+                      "a/three": {}},
+        archives={"https://github.com/a/one/": "2023-01-01"}
+    )
+    yield server
+    server.shutdown()
+
+
+def test_claim_batch(queue):
+    tasks = work_queue.claim_batch(queue, worker="w1", batch_size=2)
+    assert tasks == [(1, "https://github.com/a/one/"), (2, "https://github.com/a/two/")]
+    # Leased tasks cannot be claimed by another worker.
+    assert work_queue.claim_batch(queue, worker="w2", batch_size=10) == [(3, "https://github.com/a/three/")]
+    assert work_queue.claim_batch(queue, worker="w3", batch_size=10) == []
+
+
+def test_expired_lease_is_taken_over(queue):
+    work_queue.claim_batch(queue, worker="stalled", batch_size=3, lease_time=0.1)
+    assert work_queue.claim_batch(queue, worker="w1", batch_size=3) == []
+    time.sleep(0.2)
+    assert len(work_queue.claim_batch(queue, worker="w1", batch_size=3)) == 3
+
+
+def test_run_worker_waits_for_stalled_worker(queue):
+    work_queue.claim_batch(queue, worker="stalled", batch_size=1, lease_time=0.5)
+    completed = work_queue.run_worker(queue, lambda pmid, url: {"url": url}, worker="w1",
+                                      poll_interval=0.1)
+    assert completed == 3
+    assert work_queue.read_results(queue)[1] == {"url": "https://github.com/a/one/"}
+
+
+def test_duplicate_completion(queue):
+    work_queue.claim_batch(queue, worker="stalled", batch_size=3, lease_time=0.1)
+    time.sleep(0.2)
+    work_queue.claim_batch(queue, worker="w1", batch_size=1)
+    assert work_queue.complete_task(queue, 1, worker="w1", result={"result": "w1"})
+    assert work_queue.complete_task(queue, 1, worker="w1", result={"result": "w1"})
+    # The stalled worker finishes after the task has been taken over.
+    assert not work_queue.complete_task(queue, 1, worker="stalled", result={"result": "stalled"})
+    assert work_queue.read_results(queue) == {1: {"result": "w1"}}
+
+
+def test_failed_tasks_are_retried(queue):
+    calls = []
+
+    def task_function(pmid, url):
+        calls.append(pmid)
+        if pmid == 2 and calls.count(2) < 2:
+            raise RuntimeError("API error")
+        if pmid == 3:
+            raise RuntimeError("API error")
+        return {"url": url}
+
+    completed = work_queue.run_worker(queue, task_function, worker="w1", max_attempts=3)
+    assert completed == 2
+    assert calls.count(2) == 2
+    assert calls.count(3) == 3
+    assert sorted(work_queue.read_results(queue)) == [1, 2]
+
+
+def test_create_queue_resume(queue):
+    work_queue.run_worker(queue, lambda pmid, url: {"url": url}, worker="w1")
+    # Same source: only the task with a new URL is queried again.
+    work_queue.create_queue(queue, [(1, "https://github.com/a/new/"),
+                                    (2, "https://github.com/a/two/")])
+    assert work_queue.run_worker(queue, lambda pmid, url: {"url": url}, worker="w2") == 1
+    assert work_queue.read_results(queue) == {1: {"url": "https://github.com/a/new/"},
+                                              2: {"url": "https://github.com/a/two/"}}
+
+
+def test_create_queue_retries_exhausted_tasks(queue):
+    work_queue.run_worker(queue, lambda pmid, url: 1 / 0, worker="w1")
+    assert work_queue.read_results(queue) == {}
+    work_queue.create_queue(queue, [(1, "https://github.com/a/one/")])
+    assert work_queue.run_worker(queue, lambda pmid, url: {"url": url}, worker="w2") == 1
+
+
+def test_create_queue_new_source(queue):
+    work_queue.run_worker(queue, lambda pmid, url: {"url": url}, worker="w1")
+    work_queue.create_queue(queue, [(1, "https://github.com/a/one/")], source="new input")
+    assert work_queue.read_results(queue) == {}
+    assert work_queue.run_worker(queue, lambda pmid, url: {"url": url}, worker="w2") == 1
+
+
+def test_run_workers_with_stub_api(queue, stub_api, tmp_path):
+    api_url = f"http://localhost:{stub_api.server_port}"
+    completed = work_queue.run_workers(
+        queue,
+        ["token1", "token2"],
+        lambda token: lambda pmid, url: tools.get_repo_info(
+            pmid=pmid, url=url, token=token, log_name=str(tmp_path / "error.log"), api_url=api_url
+        ),
+        batch_size=1,
+        poll_interval=0.1
+    )
+    assert completed == 3
+    assert len(stub_api.queries) == 3
+    results = work_queue.read_results(queue)
+    assert results[1] == {"date_repo_created": "2019-03-04", "date_repo_updated": "2021-01-01", "is_fork": True}
+    assert results[2] == {"date_repo_created": None, "date_repo_updated": None, "is_fork": None}
+
+
+def test_api_errors_are_retried(queue, stub_api, tmp_path):
+    api_url = f"http://localhost:{stub_api.server_port}"
+    # Rate limit then server error: the third attempt succeeds.
+    stub_api.errors["a/one"] = [429, 500]
+    # Rate limit until all attempts are used: no result is stored.
+    stub_api.errors["a/three"] = [429, 502, 503]
+    completed = work_queue.run_worker(
+        queue,
+        lambda pmid, url: tools.get_repo_info(
+            pmid=pmid, url=url, log_name=str(tmp_path / "error.log"), api_url=api_url
+        ),
+        worker="w1",
+        max_attempts=3
+    )
+    assert completed == 2
+    results = work_queue.read_results(queue)
+    assert results[1]["is_fork"] is True
+    # Not found is a final answer.
+    assert results[2] == {"date_repo_created": None, "date_repo_updated": None, "is_fork": None}
+    assert 3 not in results
+    unfinished = work_queue.report_unfinished_tasks(
+        [(1, "https://github.com/a/one/"), (3, "https://github.com/a/three/")],
+        results,
+        str(tmp_path / "logs" / "queue.log")
+    )
+    assert unfinished == [(3, "https://github.com/a/three/")]
+    assert "3: https://github.com/a/three/" in (tmp_path / "logs" / "queue.log").read_text()
+
+
+def test_software_heritage_with_stub_api(stub_api):
+    api_url = f"http://localhost:{stub_api.server_port}"
+    info = tools.check_repository_is_archived_in_swh("https://github.com/a/one/", api_url=api_url)
+    assert info == {"is_archived": True, "date_archived": "2023-01-01"}
+    info = tools.check_repository_is_archived_in_swh("https://github.com/a/two/", api_url=api_url)
+    assert info == {"is_archived": False, "date_archived": None}
+    stub_api.errors["https://github.com/a/one/"] = [429]
+    with pytest.raises(requests.HTTPError):
+        tools.check_repository_is_archived_in_swh("https://github.com/a/one/", api_url=api_url)
+
+
+def test_worker_command_line(queue, stub_api, tmp_path):
+    api_url = f"http://localhost:{stub_api.server_port}"
+    env_file = tmp_path / ".env"
+    env_file.write_text("GITHUB_TOKEN=token\n")
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    # Run in an empty directory, without logs/ folder.
+    subprocess.run(
+        [sys.executable, "-m", "scripts.work_queue", "github", queue,
+         "--env", str(env_file), "--api-url", api_url],
+        cwd=tmp_path, env={**os.environ, "PYTHONPATH": package_dir}, check=True
+    )
+    assert sorted(work_queue.read_results(queue)) == [1, 2, 3]
+    assert (tmp_path / "logs" / "work_queue.txt").exists()